@@ -0,0 +1,91 @@
+"""
+Compares the per-question latency of the chained and fused pipelines of QueryTranslator.
+
+Usage:
+    python benchmarks/fused_pipeline_latency.py --config config.yaml --language Fr
+
+Each question is answered once with the chained pipeline (translation, then SQL generation)
+and once with fused=True (both in one LLM call). The average and median latency and the
+number of LLM calls per question are printed for both modes.
+
+With --simulate-llm-latency SECONDS the configured provider is replaced by a stub that
+sleeps for that long and returns a canned reply, which isolates the round trip count from
+the model speed. The stub answers every question with SELECT 1.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from naturalquery.query_translator import QueryTranslator
+from naturalquery.cache.translation_cache import TranslationCache
+
+QUESTIONS = {
+    'Fr': [
+        "Quels sont les fournisseurs qui ont des produits les plus notés par les clients ?",
+        "Combien de produits chaque fournisseur propose-t-il ?",
+        "Quel est le produit le plus cher ?",
+        "Quelle est la note moyenne de chaque produit ?",
+    ],
+    'Ar': [
+        "ما هو المنتج الأغلى؟",
+        "كم عدد المنتجات لكل مورد؟",
+    ],
+}
+
+def simulated_provider(latency):
+    def send_prompt(prompt, json_output=False):
+        time.sleep(latency)
+        system_prompt = prompt[0]['content']
+        if 'Add comments' in system_prompt:
+            return "-- enriched ddl"
+        if 'JSON' in system_prompt:
+            return json.dumps({"question": "simulated question", "sql": "SELECT 1 AS result"})
+        if 'SQL develper' in system_prompt:
+            return "```sql\nSELECT 1 AS result\n```"
+        return "simulated answer"
+    return send_prompt
+
+def measure(config, language, fused, questions, simulate_llm_latency):
+    translator = QueryTranslator(config_path=config, language=language, fused=fused)
+    # Translations cached by earlier runs would hide the round trip being measured
+    translator.language_translator.cache = TranslationCache(persist=False)
+    # Templates learned by the previous mode would answer without the LLM, and grounding adds queries
+    translator.sql_templates = None
+    translator.value_index = None
+    provider = translator.llm_interface.provider
+    if simulate_llm_latency is not None:
+        provider.send_prompt = simulated_provider(simulate_llm_latency)
+    calls = [0]
+    send_prompt = provider.send_prompt
+    def counted_send_prompt(*args, **kwargs):
+        calls[0] += 1
+        return send_prompt(*args, **kwargs)
+    provider.send_prompt = counted_send_prompt
+
+    # Warm up the enriched DDL cache so both modes are measured on the hot path
+    translator.get_database_ddl()
+    calls[0] = 0
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        translator.answer(question)
+        latencies.append(time.perf_counter() - start)
+    translator.close()
+    return latencies, calls[0] / len(questions)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', required=True)
+    parser.add_argument('--language', default='Fr', choices=sorted(QUESTIONS))
+    parser.add_argument('--simulate-llm-latency', type=float, default=None)
+    args = parser.parse_args()
+
+    questions = QUESTIONS[args.language]
+    for name, fused in (('chain', False), ('fused', True)):
+        latencies, calls = measure(args.config, args.language, fused, questions, args.simulate_llm_latency)
+        print(f"{name}: avg {statistics.mean(latencies):.2f}s, median {statistics.median(latencies):.2f}s, "
+              f"{calls:.1f} LLM calls/question")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Measures the throughput of the local transformers provider on CPU.
+
+Usage:
+    python benchmarks/transformers_provider_throughput.py --model <model id or path> --questions 32 --concurrency 8
+
+The same questions are sent once sequentially and once from `concurrency` threads,
+so the gain from dynamic batching can be read from the two questions/sec figures.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from naturalquery.query_translator.llm_interface import TransformersProvider
+
+DDL = """CREATE TABLE suppliers (
+supplierid SERIAL PRIMARY KEY,
+name VARCHAR(255) NOT NULL,
+country VARCHAR(100)
+)
+
+CREATE TABLE products (
+productid SERIAL PRIMARY KEY,
+name VARCHAR(255) NOT NULL,
+price NUMERIC,
+supplierid INTEGER
+)
+
+CREATE TABLE reviews (
+reviewid SERIAL PRIMARY KEY,
+productid INTEGER,
+rating INTEGER,
+comment TEXT
+)
+-- products.supplierid can be joined with suppliers.supplierid
+-- reviews.productid can be joined with products.productid"""
+
+QUESTIONS = [
+    "How many products does each supplier have?",
+    "Which supplier has the most reviews?",
+    "What is the average rating of each product?",
+    "List the products cheaper than 10.",
+    "Which country has the most suppliers?",
+    "What is the most expensive product?",
+    "How many reviews have a rating of 5?",
+    "List suppliers without any product.",
+]
+
+def build_prompt(question):
+    return [{"role": "system", "content": "You are a helpful SQL develper. Reply with SQL code only."},
+            {"role": "user", "content": f"Depending on the following SQL DDL:\n{DDL}\nAnswer the question in SQL: {question}\n "}]
+
+def run(provider, prompts, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(provider.send_prompt, prompts))
+    return len(prompts) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True)
+    parser.add_argument('--questions', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--max-new-tokens', type=int, default=64)
+    args = parser.parse_args()
+
+    config = {'llm': {
+        'provider': 'transformers',
+        'model': args.model,
+        'num_threads': args.threads,
+        'max_batch_size': args.concurrency,
+        'model_kwargs': {'max_new_tokens': args.max_new_tokens, 'do_sample': False},
+    }}
+    provider = TransformersProvider(config)
+    prompts = [build_prompt(QUESTIONS[i % len(QUESTIONS)]) for i in range(args.questions)]
+    # Warm up, this also fills the DDL prefix cache
+    provider.send_prompt(prompts[0])
+    provider.send_prompt(prompts[1])
+
+    sequential = run(provider, prompts, concurrency=1)
+    batched = run(provider, prompts, concurrency=args.concurrency)
+    print(f"model: {args.model}")
+    print(f"sequential: {sequential:.2f} questions/sec")
+    print(f"concurrency {args.concurrency}: {batched:.2f} questions/sec")
+
+if __name__ == '__main__':
+    main()
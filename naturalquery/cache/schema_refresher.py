@@ -0,0 +1,98 @@
+import threading
+from ..scheduler import request_context
+
+
+class SchemaRefresher:
+    """
+    Keeps the enriched database DDL up to date in a background thread.
+
+    The refresher polls the connector's cheap schema fingerprint every `interval` seconds.
+    When the fingerprint changes, the schema is re-introspected and re-enriched off the
+    request path, then the new catalog is swapped in under a lock. Readers always get a
+    complete catalog: either the previous one or the new one.
+    """
+    def __init__(self, db_connector, enrich_fn, interval=300):
+        self.db_connector = db_connector
+        self.enrich_fn = enrich_fn
+        self.interval = interval
+        self._fingerprint = None
+        self._catalog = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        # Extra periodic work run on the refresher thread after each schema check
+        self.tasks = []
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="naturalquery-schema-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # Background work yields to user requests when a scheduler is used
+        with request_context(priority='batch', tenant='naturalquery-refresher'):
+            self._loop()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good catalog, we will retry on the next tick
+                print(f"An error occurred while refreshing the schema: {e}")
+                # Don't leave the first readers waiting, they fall back to a synchronous load
+                self._ready.set()
+            for task in self.tasks:
+                try:
+                    task()
+                except Exception as e:
+                    print(f"An error occurred in a schema refresher task: {e}")
+            self._stop_event.wait(self.interval)
+
+    def refresh(self, force=False) -> bool:
+        """
+        Re-introspects and re-enriches the schema if its fingerprint changed.
+
+        Returns:
+            bool: True if a new catalog was swapped in.
+        """
+        fingerprint = self.db_connector.get_schema_fingerprint()
+        if not force and fingerprint == self._fingerprint:
+            self._ready.set()
+            return False
+        database_ddl = self.db_connector.get_all_schemas_ddl()
+        enriched_ddl = self.enrich_fn(database_ddl)
+        if enriched_ddl is None:
+            # The LLM call failed, don't replace a good catalog with nothing
+            self._ready.set()
+            return False
+        with self._lock:
+            self._fingerprint = fingerprint
+            self._catalog = enriched_ddl
+        self._ready.set()
+        return True
+
+    @property
+    def fingerprint(self):
+        with self._lock:
+            return self._fingerprint
+
+    def get_catalog(self, timeout=None):
+        """
+        Returns the current enriched DDL.
+
+        Only the very first call may wait, until the initial load completes or `timeout` expires.
+        Returns None if no catalog has been loaded yet.
+        """
+        self._ready.wait(timeout)
+        with self._lock:
+            return self._catalog
@@ -0,0 +1,61 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+class TranslationCache:
+    """
+    Bounded LRU cache of (source language, text) -> translation.
+
+    When `persist` is True the entries are also written to a JSON file in `cache_dir`
+    so they survive restarts.
+    """
+    def __init__(self, max_size=1024, cache_dir='cache_data', persist=True):
+        self.max_size = max_size
+        self.cache_file = os.path.join(cache_dir, "translations_cache.json") if persist else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_file is not None:
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            self._load()
+
+    @staticmethod
+    def _key(source_language, text):
+        return f"{source_language}\x1f{text.strip()}"
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return
+        for key, value in entries[-self.max_size:]:
+            self._entries[key] = value
+
+    def _save(self):
+        with open(self.cache_file, 'w') as file:
+            json.dump(list(self._entries.items()), file)
+
+    def get(self, source_language, text):
+        key = self._key(source_language, text)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, source_language, text, translation):
+        key = self._key(source_language, text)
+        with self._lock:
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            if self.cache_file is not None:
+                self._save()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import difflib
+import threading
+from collections import Counter
+from ..scheduler import request_context
+from ..utils import literal_spans, quote_string, replace_spans
+
+TEXT_TYPE_HINTS = ('char', 'text', 'string', 'clob', 'user-defined')
+
+class ColumnValueIndex:
+    """
+    Index of the distinct values of low-cardinality text columns.
+
+    Values are sampled with bounded DISTINCT queries and kept as sorted lists per
+    `table.column` in a JSON file. Columns with more than `max_distinct` values are
+    remembered as high-cardinality and skipped. `refresh` is incremental: each call only
+    re-samples the columns that are missing or older than `refresh_hours`.
+    """
+    def __init__(self, db_connector, cache_dir='cache_data', index_key='default',
+                 max_distinct=200, refresh_hours=24):
+        self.db_connector = db_connector
+        self.max_distinct = max_distinct
+        self.refresh_seconds = refresh_hours * 3600
+        self.cache_file = os.path.join(cache_dir, f"{index_key}_values_cache.json")
+        self._lock = threading.Lock()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        # "table.column" -> {"values": sorted list or None if high-cardinality, "refreshed_at": timestamp}
+        self._columns = self._load()
+        # Whether a previous run or a refresh() has sampled the database, even if no text column was found
+        self.built = os.path.exists(self.cache_file)
+        # (schema fingerprint, text columns) of the last listing
+        self._text_columns_cache = None
+        self._lookup = {}
+        self._build_lookup()
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        with open(self.cache_file, 'w') as file:
+            json.dump(self._columns, file)
+
+    def _build_lookup(self):
+        # Case and whitespace insensitive value -> canonical value, per column
+        lookup = {}
+        for key, entry in self._columns.items():
+            if entry['values'] is not None:
+                lookup[key] = {self._normalize(value): value for value in entry['values']}
+        self._lookup = lookup
+
+    @staticmethod
+    def _normalize(value):
+        return " ".join(value.lower().split())
+
+    def __len__(self):
+        return len(self._columns)
+
+    def _text_columns(self, fingerprint=None):
+        if fingerprint is not None and self._text_columns_cache is not None and self._text_columns_cache[0] == fingerprint:
+            return self._text_columns_cache[1]
+        columns = []
+        for table in self.db_connector.get_tables():
+            for column in self.db_connector.get_schema(table).columns:
+                if any(hint in (column.dtype or '').lower() for hint in TEXT_TYPE_HINTS):
+                    columns.append((f"{table}.{column.name}".lower(), table, column.name))
+        self._text_columns_cache = (fingerprint, columns)
+        return columns
+
+    def refresh(self, max_columns=None, fingerprint=None) -> int:
+        """
+        Samples the text columns that are missing from the index or stale.
+
+        Args:
+            max_columns (int): Maximum number of columns to sample in this call, None for all.
+            fingerprint (str): Current schema fingerprint, the tables are only introspected again
+                to list the text columns when it changed. None to always introspect them.
+
+        Returns:
+            int: The number of columns sampled.
+        """
+        now = time.time()
+        columns = self._text_columns(fingerprint)
+        current_keys = {key for key, _, _ in columns}
+        stale = [(self._columns.get(key, {}).get('refreshed_at', 0), key, table, column)
+                 for key, table, column in columns
+                 if now - self._columns.get(key, {}).get('refreshed_at', 0) >= self.refresh_seconds]
+        # Stalest (or never sampled) first
+        stale.sort()
+        if max_columns is not None:
+            stale = stale[:max_columns]
+
+        sampled = {}
+        for _, key, table, column in stale:
+            values = self.db_connector.get_distinct_values(table, column, self.max_distinct + 1)
+            values = sorted({str(value) for value in values})
+            sampled[key] = {
+                'values': values if len(values) <= self.max_distinct else None,
+                'refreshed_at': now,
+            }
+
+        with self._lock:
+            # Drop the columns which no longer exist
+            self._columns = {key: entry for key, entry in self._columns.items() if key in current_keys}
+            self._columns.update(sampled)
+            self._build_lookup()
+            self._save()
+        self.built = True
+        return len(sampled)
+
+    def refresh_in_background(self, max_columns=None):
+        """ Runs refresh() once on a daemon thread, keeping it off the request path. """
+        def run():
+            # Sampling yields to user requests when a scheduler is used
+            with request_context(priority='batch', tenant='naturalquery-refresher'):
+                try:
+                    self.refresh(max_columns)
+                except Exception as e:
+                    print(f"An error occurred while refreshing the value index: {e}")
+        thread = threading.Thread(target=run, name="naturalquery-value-index", daemon=True)
+        thread.start()
+        return thread
+
+    def suggest(self, table, column, value, fuzzy=False):
+        """
+        Returns the stored value `value` most likely refers to, None if it is already
+        a stored value or nothing close enough is known.
+
+        Only a stored value differing in case or whitespace is returned, unless `fuzzy` where the
+        closest stored value is, which may be a different one (e.g. 'Global Supplies 2' for
+        'Global Supplies 3').
+        """
+        values = self._lookup.get(f"{table}.{column}".lower())
+        if not values or value in values.values():
+            return None
+        canonical = values.get(self._normalize(value))
+        if canonical is not None or not fuzzy:
+            return canonical
+        close = difflib.get_close_matches(self._normalize(value), list(values), n=1, cutoff=0.85)
+        return values[close[0]] if close else None
+
+    def has_column(self, table, column):
+        return f"{table}.{column}".lower() in self._lookup
+
+    def _indexed_literals(self, sql: str, dialect: str = None):
+        """
+        Returns:
+            tuple: (parsed expression or None, list of (table, column, literal node)) for the string
+            literals compared with =, <> or IN to an indexed column.
+        """
+        import sqlglot
+        from sqlglot import exp
+        if not self._lookup:
+            return None, []
+        try:
+            expression = sqlglot.parse_one(sql, read=dialect)
+        except Exception:
+            return None, []
+        if expression is None:
+            return None, []
+
+        aliases = {table.alias_or_name.lower(): table.name for table in expression.find_all(exp.Table)}
+        literals = []
+
+        def resolve_table(column):
+            if column.table:
+                return aliases.get(column.table.lower())
+            candidates = [table for table in aliases.values() if self.has_column(table, column.name)]
+            return candidates[0] if len(candidates) == 1 else None
+
+        def collect(column, literal):
+            if not isinstance(column, exp.Column) or not isinstance(literal, exp.Literal) or not literal.is_string:
+                return
+            table = resolve_table(column)
+            if table is not None and self.has_column(table, column.name):
+                literals.append((table, column.name, literal))
+
+        for comparison in expression.find_all(exp.EQ, exp.NEQ, exp.In):
+            if isinstance(comparison, exp.In):
+                for literal in comparison.expressions:
+                    collect(comparison.this, literal)
+            else:
+                collect(comparison.this, comparison.expression)
+                collect(comparison.expression, comparison.this)
+        return expression, literals
+
+    def check_values(self, sql: str, dialect: str = None):
+        """
+        Checks the string literals compared to indexed columns.
+
+        Returns:
+            list: (column, value, stored value or None) for every literal which isn't a stored value,
+            the stored value being the one it matches ignoring case and whitespace, if any.
+        """
+        _, literals = self._indexed_literals(sql, dialect)
+        unknown = []
+        for table, column, literal in literals:
+            values = self._lookup[f"{table}.{column}".lower()]
+            if literal.this not in values.values():
+                unknown.append((f"{table}.{column}", literal.this, self.suggest(table, column, literal.this)))
+        return unknown
+
+    def ground_sql(self, sql: str, dialect: str = None, fuzzy=False):
+        """
+        Rewrites string literals compared to indexed columns to the stored values they refer to,
+        e.g. name = 'Global supplies' becomes name = 'Global Supplies'. See suggest() for `fuzzy`.
+
+        Returns:
+            tuple: (sql, list of (column, original value, replacement)). The sql is returned
+            untouched when nothing needs to be replaced.
+        """
+        _, literals = self._indexed_literals(sql, dialect)
+        canonicals = {}
+        targets = Counter()
+        for table, column, literal in literals:
+            targets[literal.this] += 1
+            canonical = self.suggest(table, column, literal.this, fuzzy)
+            if canonical is not None:
+                canonicals.setdefault(literal.this, []).append((f"{table}.{column}", canonical))
+        if not canonicals:
+            return sql, []
+
+        # A value is only replaced when all its occurrences are comparisons to the same stored value
+        spans = [(start, end, value) for start, end, value, is_string in literal_spans(sql, dialect) if is_string]
+        occurrences = Counter(value for _, _, value in spans)
+        replacements = []
+        edits = []
+        for value, columns in canonicals.items():
+            stored_values = {canonical for _, canonical in columns}
+            if occurrences[value] != targets[value] or len(columns) != targets[value] or len(stored_values) != 1:
+                continue
+            canonical = stored_values.pop()
+            replacements.extend((column, value, canonical) for column, _ in columns)
+            edits.extend((start, end, quote_string(canonical)) for start, end, span_value in spans if span_value == value)
+        if not edits:
+            return sql, []
+        return replace_spans(sql, edits), replacements
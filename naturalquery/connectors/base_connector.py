@@ -1,5 +1,6 @@
 from ..models.schemas import Table
 
+import threading
 from abc import ABC, abstractmethod
 from typing import List
 from functools import wraps
@@ -9,9 +10,24 @@ from functools import wraps
 class DatabaseConnector(ABC):
     def __init__(self, credentials):
         self.credentials = credentials
+        # Connections are per thread so concurrent requests don't close each other's connection
+        self._local = threading.local()
         self.connection = None
         self.db_type = None
+        # sqlglot dialect name, and the DBAPI bind parameter placeholder of the driver
+        self.sql_dialect = None
+        self.param_placeholder = '?'
+        # Optional RequestScheduler limiting concurrent database work
+        self.scheduler = None
     
+    @property
+    def connection(self):
+        return getattr(self._local, 'connection', None)
+
+    @connection.setter
+    def connection(self, connection):
+        self._local.connection = connection
+
     @abstractmethod
     def connect(self):
         pass
@@ -23,11 +39,15 @@ class DatabaseConnector(ABC):
     def with_connection(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            self.connect()
-            try:
-                return func(self, *args, **kwargs)
-            finally:
-                self.close()
+            def run():
+                self.connect()
+                try:
+                    return func(self, *args, **kwargs)
+                finally:
+                    self.close()
+            if self.scheduler is not None:
+                return self.scheduler.run('db', run)
+            return run()
         return wrapper
 
     @abstractmethod
@@ -46,18 +66,256 @@ class DatabaseConnector(ABC):
     def get_tables(self):
         pass
 
+    def query_to_dataframe(self, query, batch_size=10000, params=None):
+        """
+        Runs the query and returns the results as a pandas DataFrame.
+
+        Bind parameters in `params` are passed to the driver, the query must use the
+        connector's `param_placeholder` for them.
+
+        When pyarrow is installed the rows are fetched in batches straight into Arrow record
+        batches and handed to pandas with Arrow-backed dtypes, which avoids building a Python
+        object per cell. Otherwise it falls back to pd.read_sql.
+        """
+        import pandas as pd
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return self._read_sql(query, params)
+        return self.query_to_arrow(query, batch_size=batch_size, params=params).to_pandas(types_mapper=pd.ArrowDtype)
+
     @with_connection
-    def query_to_dataframe(self, query):
+    def _read_sql(self, query, params=None):
         import pandas as pd
         import warnings
         # Ignore the specific UserWarning related to pandas and non-SQLAlchemy connections
         warnings.filterwarnings("ignore", message="pandas only supports SQLAlchemy connectable.*")
-        return pd.read_sql(query, self.connection)
+        return pd.read_sql(query, self.connection, params=params)
+
+    def _open_cursor(self, batch_size):
+        """ Cursor the results are fetched from, connectors whose default cursor buffers the whole result override it. """
+        return self.connection.cursor()
+
+    def _execute_cursor(self, query, params=None, batch_size=10000):
+        """ Executes the query on a new cursor and returns it, raising pandas' DatabaseError on failure. """
+        from pandas.errors import DatabaseError
+        cursor = self._open_cursor(batch_size)
+        try:
+            if params is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(query, params)
+        except Exception as exc:
+            cursor.close()
+            # Same error type as pd.read_sql so callers can catch failed queries uniformly
+            raise DatabaseError(f"Execution failed on sql '{query}': {exc}") from exc
+        return cursor
+
+    @staticmethod
+    def _column_names(cursor):
+        """ Column names of the result, duplicates (e.g. s.name and p.name in a join) get a .1, .2... suffix. """
+        names, seen = [], {}
+        for description in cursor.description or []:
+            name = description[0]
+            if name in seen:
+                seen[name] += 1
+                candidate = f"{name}.{seen[name]}"
+                while candidate in seen:
+                    seen[name] += 1
+                    candidate = f"{name}.{seen[name]}"
+                name = candidate
+            seen.setdefault(name, 0)
+            names.append(name)
+        return names
+
+    @staticmethod
+    def _to_string_array(values):
+        import pyarrow as pa
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+    @classmethod
+    def _to_arrow_array(cls, values):
+        """ Converts a column of Python values, falling back to strings when no Arrow type fits them all. """
+        import pyarrow as pa
+        try:
+            return pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # e.g. a SQLite column holding both 'a' and 3
+            return cls._to_string_array(values)
+
+    @classmethod
+    def _fetch_record_batches(cls, cursor, batch_size):
+        """ Yields the remaining rows of the cursor as pyarrow RecordBatches of up to batch_size rows. """
+        import pyarrow as pa
+        names = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if names is None:
+                # Server-side cursors only have a description after the first fetch
+                names = cls._column_names(cursor)
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays([cls._to_arrow_array(column) for column in columns], names=names)
+
+    @staticmethod
+    def _unify_schemas(schemas):
+        """
+        Schema able to hold the data of all `schemas` without loss: NULL columns take the other
+        types, ints widen to floats, decimals widen... Columns with incompatible types become strings.
+        """
+        import pyarrow as pa
+        fields = []
+        for i, field in enumerate(schemas[0]):
+            types = [schema.field(i).type for schema in schemas]
+            try:
+                unified = pa.unify_schemas([pa.schema([pa.field(field.name, t)]) for t in types],
+                                           promote_options="permissive").field(0).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                unified = pa.string()
+            fields.append(pa.field(field.name, unified))
+        return pa.schema(fields)
+
+    @classmethod
+    def _conform(cls, table, schema):
+        """ Casts the table to a schema returned by _unify_schemas. """
+        import pyarrow as pa
+        if table.schema.equals(schema):
+            return table
+        columns = []
+        for column, field in zip(table.columns, schema):
+            if column.type.equals(field.type):
+                columns.append(column)
+                continue
+            try:
+                columns.append(column.cast(field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                columns.append(cls._to_string_array(column.to_pylist()))
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    @classmethod
+    def _concat_batches(cls, batches, names):
+        import pyarrow as pa
+        if not batches:
+            return pa.Table.from_arrays([pa.array([], type=pa.null()) for _ in names], names=names)
+        tables = [pa.Table.from_batches([batch]) for batch in batches]
+        if len(tables) == 1:
+            return tables[0]
+        # Types are inferred per batch (e.g. an all NULL batch, or decimals of different precision)
+        schema = cls._unify_schemas([table.schema for table in tables])
+        return pa.concat_tables([cls._conform(table, schema) for table in tables])
+
+    @with_connection
+    def query_to_arrow(self, query, batch_size=10000, params=None):
+        """ Runs the query and returns the results as a pyarrow Table. """
+        import pyarrow as pa
+        from pandas.errors import DatabaseError
+        cursor = self._execute_cursor(query, params, batch_size)
+        try:
+            batches = list(self._fetch_record_batches(cursor, batch_size))
+            return self._concat_batches(batches, self._column_names(cursor))
+        except pa.ArrowException as exc:
+            raise DatabaseError(f"Couldn't convert the results of sql '{query}': {exc}") from exc
+        finally:
+            cursor.close()
+
+    @with_connection
+    def query_to_file(self, query, path, batch_size=10000, params=None):
+        """
+        Streams the results of the query to a Parquet (.parquet) or Feather (.feather, .arrow) file
+        without holding the whole result set in memory.
+
+        The schema comes from the first batch and is widened when a later batch doesn't fit it
+        (e.g. a larger decimal, or floats after whole numbers): the rows written so far are then
+        copied batch by batch into a new file with the wider schema.
+
+        Returns:
+            int: The number of rows written.
+        """
+        import os
+        import pyarrow as pa
+        from pandas.errors import DatabaseError
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            open_writer = lambda target, schema: pq.ParquetWriter(target, schema)
+            read_batches = lambda source: pq.ParquetFile(source).iter_batches(batch_size=batch_size)
+        elif path.endswith(('.feather', '.arrow')):
+            open_writer = lambda target, schema: pa.ipc.new_file(target, schema)
+            def read_batches(source):
+                with pa.memory_map(source) as stream:
+                    reader = pa.ipc.open_file(stream)
+                    for i in range(reader.num_record_batches):
+                        yield reader.get_batch(i)
+        else:
+            raise ValueError("Unsupported file format. Use a .parquet, .feather or .arrow path.")
+
+        cursor = self._execute_cursor(query, params, batch_size)
+        # Written to a side file, moved to `path` once complete
+        partial_path = f"{path}.partial"
+        promotions = 0
+        writer = None
+        schema = None
+        num_rows = 0
+        try:
+            for batch in self._fetch_record_batches(cursor, batch_size):
+                num_rows += batch.num_rows
+                table = pa.Table.from_batches([batch])
+                if writer is None:
+                    schema = table.schema
+                    writer = open_writer(partial_path, schema)
+                elif not table.schema.equals(schema):
+                    wider = self._unify_schemas([schema, table.schema])
+                    if not wider.equals(schema):
+                        # Copy what was written so far into a file with the wider schema
+                        writer.close()
+                        promotions += 1
+                        promoted_path = f"{path}.partial{promotions}"
+                        writer = open_writer(promoted_path, wider)
+                        for written in read_batches(partial_path):
+                            writer.write_table(self._conform(pa.Table.from_batches([written]), wider))
+                        os.remove(partial_path)
+                        partial_path = promoted_path
+                        schema = wider
+                writer.write_table(self._conform(table, schema))
+            if writer is None:
+                writer = open_writer(partial_path, self._concat_batches([], self._column_names(cursor)).schema)
+            writer.close()
+            writer = None
+            os.replace(partial_path, path)
+        except pa.ArrowException as exc:
+            raise DatabaseError(f"Couldn't convert the results of sql '{query}': {exc}") from exc
+        finally:
+            cursor.close()
+            if writer is not None:
+                writer.close()
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        return num_rows
 
     def get_all_schemas_ddl(self):
         tables = self.get_tables()
         all_tables = [self.get_schema(table) for table in tables]
         return self.format_tables(all_tables)
+
+    @staticmethod
+    def quote_identifier(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def get_distinct_values(self, table, column, limit):
+        """ Returns up to `limit` distinct non NULL values of a column. """
+        column = self.quote_identifier(column)
+        query = f"SELECT DISTINCT {column} FROM {self.quote_identifier(table)} WHERE {column} IS NOT NULL LIMIT {int(limit)}"
+        return [row[0] for row in self.execute_select_query(query)]
+
+    def get_schema_fingerprint(self) -> str:
+        """
+        Returns a short string that changes whenever the database schema changes.
+
+        The default implementation hashes the full DDL, connectors should override it
+        with a cheaper single query against the catalog when one is available.
+        """
+        import hashlib
+        return hashlib.sha256(self.get_all_schemas_ddl().encode()).hexdigest()
     
     def map_data_type(self, data_type, character_maximum_length, default):
         """Map general data types to SQL data types."""
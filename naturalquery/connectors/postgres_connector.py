@@ -6,11 +6,21 @@ class PostgresSQLConnector(DatabaseConnector):
     def __init__(self, credentials: PostgresCredentials):
         super().__init__(credentials)
         self.db_type = 'postgres'
+        self.sql_dialect = 'postgres'
+        self.param_placeholder = '%s'
 
     def connect(self):
         import psycopg2
         self.connection = psycopg2.connect(**self.credentials)
 
+    def _open_cursor(self, batch_size):
+        import uuid
+        # A named cursor is server-side: fetchmany() pulls batch_size rows at a time instead of
+        # the client-side cursor loading the whole result in memory during execute()
+        cursor = self.connection.cursor(name=f"naturalquery_{uuid.uuid4().hex}")
+        cursor.itersize = batch_size
+        return cursor
+
     @DatabaseConnector.with_connection
     def execute_query(self, query):
         with self.connection.cursor() as cursor:
@@ -34,6 +44,24 @@ class PostgresSQLConnector(DatabaseConnector):
             cursor.execute(query)
             return [row[0] for row in cursor.fetchall()]
     
+    @DatabaseConnector.with_connection
+    def get_schema_fingerprint(self):
+        query = """
+            SELECT md5(
+                coalesce((SELECT string_agg(table_name || '.' || column_name || ':' || data_type || ':'
+                                            || is_nullable || ':' || coalesce(column_default, ''), ','
+                                            ORDER BY table_name, ordinal_position)
+                          FROM information_schema.columns WHERE table_schema = 'public'), '')
+                || '|' ||
+                coalesce((SELECT string_agg(table_name || '.' || constraint_name || ':' || constraint_type, ','
+                                            ORDER BY table_name, constraint_name)
+                          FROM information_schema.table_constraints WHERE table_schema = 'public'), '')
+            );
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(query)
+            return cursor.fetchone()[0]
+
     @DatabaseConnector.with_connection
     def get_schema(self, table):
         column_query = f"""
@@ -6,6 +6,7 @@ class SQLiteConnector(DatabaseConnector):
     def __init__(self, credentials: SQLiteCredentials):
         super().__init__(credentials)
         self.db_type = 'SQLite'
+        self.sql_dialect = 'sqlite'
 
     def connect(self):
         import sqlite3
@@ -34,6 +35,13 @@ class SQLiteConnector(DatabaseConnector):
         cursor.execute(query)
         return [row[0] for row in cursor.fetchall()]
     
+    @DatabaseConnector.with_connection
+    def get_schema_fingerprint(self):
+        # schema_version is bumped by SQLite on every DDL statement
+        cursor = self.connection.cursor()
+        cursor.execute("PRAGMA schema_version;")
+        return str(cursor.fetchone()[0])
+
     @DatabaseConnector.with_connection
     def get_schema(self, table):
         cursor = self.connection.cursor()
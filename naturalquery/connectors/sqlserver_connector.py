@@ -6,6 +6,7 @@ class SqlServerConnector(DatabaseConnector):
     def __init__(self, credentials: SQLServerCredentials):
         super().__init__(credentials)
         self.db_type = 'SQLServer'
+        self.sql_dialect = 'tsql'
 
     def connect(self):
         import pyodbc
@@ -34,6 +35,11 @@ class SqlServerConnector(DatabaseConnector):
             cursor.execute(query)
             return cursor.fetchall()
     
+    def get_distinct_values(self, table, column, limit):
+        column = self.quote_identifier(column)
+        query = f"SELECT DISTINCT TOP {int(limit)} {column} FROM {self.quote_identifier(table)} WHERE {column} IS NOT NULL"
+        return [row[0] for row in self.execute_select_query(query)]
+
     @DatabaseConnector.with_connection
     def get_tables(self):
         query = "SELECT table_name FROM information_schema.tables WHERE table_type = 'BASE TABLE'"
@@ -41,6 +47,20 @@ class SqlServerConnector(DatabaseConnector):
             cursor.execute(query)
             return [row[0] for row in cursor.fetchall()]
     
+    @DatabaseConnector.with_connection
+    def get_schema_fingerprint(self):
+        query = """
+            SELECT
+                (SELECT CHECKSUM_AGG(CHECKSUM(TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT))
+                 FROM INFORMATION_SCHEMA.COLUMNS),
+                (SELECT CHECKSUM_AGG(CHECKSUM(TABLE_NAME, CONSTRAINT_NAME, CONSTRAINT_TYPE))
+                 FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS)
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(query)
+        columns_checksum, constraints_checksum = cursor.fetchone()
+        return f"{columns_checksum}:{constraints_checksum}"
+
     @DatabaseConnector.with_connection
     def get_schema(self, table):
         cursor = self.connection.cursor()
@@ -1,16 +1,90 @@
 # query_translator/language_translator.py
+import re
+import time
 from .llm_interface import LLMClient
+from ..cache.translation_cache import TranslationCache
+
+# Small stopword lists are enough to tell apart the languages we support
+ENGLISH_STOPWORDS = {
+    'the', 'a', 'an', 'of', 'and', 'or', 'in', 'on', 'to', 'for', 'with', 'by', 'from', 'is', 'are',
+    'was', 'were', 'what', 'which', 'who', 'whom', 'how', 'many', 'much', 'most', 'have', 'has',
+    'that', 'this', 'these', 'those', 'all', 'each', 'per', 'me', 'show', 'list', 'give', 'do', 'does',
+}
+FRENCH_STOPWORDS = {
+    'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de', 'et', 'ou', 'en', 'au', 'aux', 'pour', 'avec',
+    'par', 'est', 'sont', 'quel', 'quels', 'quelle', 'quelles', 'qui', 'que', 'quoi', 'combien',
+    'plus', 'ont', 'dans', 'sur', 'ce', 'cette', 'ces', 'tous', 'chaque', 'moi', 'donne', 'liste',
+}
+ARABIC_CHARS = re.compile(r'[؀-ۿݐ-ݿࢠ-ࣿ]')
+FRENCH_CHARS = re.compile(r'[àâçéèêëîïôûùüÿœæ]', re.IGNORECASE)
+WORDS = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+def detect_language(text: str):
+    """
+    Offline guess of the language of `text` among English, French and Arabic.
+
+    Returns the language name, or None when the text doesn't give enough evidence.
+    """
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return None
+    if sum(1 for c in letters if ARABIC_CHARS.match(c)) / len(letters) > 0.5:
+        return 'Arabic'
+    words = [w.lower() for w in WORDS.findall(text)]
+    english_score = sum(1 for w in words if w in ENGLISH_STOPWORDS)
+    french_score = sum(1 for w in words if w in FRENCH_STOPWORDS)
+    french_score += len(FRENCH_CHARS.findall(text))
+    if english_score >= 2 and english_score > 2 * french_score:
+        return 'English'
+    if french_score >= 2 and french_score > 2 * english_score:
+        return 'French'
+    return None
 
 class LanguageTranslator:
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, cache: TranslationCache = None):
         self.llm_client = llm_client
+        self.cache = cache if cache is not None else TranslationCache()
+        self.stats = {
+            'requests': 0,
+            'skipped_english': 0,
+            'cache_hits': 0,
+            'llm_calls': 0,
+            'llm_seconds': 0.0,
+        }
+
     def translate_to_english(self, text, source_language):
-        # Implement translation logic
-        # This is a placeholder
+        self.stats['requests'] += 1
+        # Fast path 1: the user actually typed English
+        if detect_language(text) == 'English':
+            self.stats['skipped_english'] += 1
+            return text
+        # Fast path 2: we already translated this exact text
+        cached = self.cache.get(source_language, text)
+        if cached is not None:
+            self.stats['cache_hits'] += 1
+            return cached
         prompt = f"Translate this text from {source_language} to English:\n{text}"
-        return self.llm_client.ask_question(
-            [{"role": "system", "content": "You are a helpful assistant translating to english the provided text. Provide only the translated text as response."}, 
+        start = time.perf_counter()
+        translation = self.llm_client.ask_question(
+            [{"role": "system", "content": "You are a helpful assistant translating to english the provided text. Provide only the translated text as response."},
               {"role": "user", "content": prompt}])
+        self.stats['llm_calls'] += 1
+        self.stats['llm_seconds'] += time.perf_counter() - start
+        if translation is not None:
+            self.cache.put(source_language, text, translation)
+        return translation
+
+    def get_stats(self) -> dict:
+        """
+        Returns the fast path counters, the hit rate and an estimate of the LLM time saved,
+        based on the average latency of the translation calls actually made.
+        """
+        stats = dict(self.stats)
+        avoided = stats['skipped_english'] + stats['cache_hits']
+        stats['hit_rate'] = avoided / stats['requests'] if stats['requests'] else 0.0
+        avg_llm_seconds = stats['llm_seconds'] / stats['llm_calls'] if stats['llm_calls'] else 0.0
+        stats['estimated_seconds_saved'] = avoided * avg_llm_seconds
+        return stats
 
     def translate_from_english(self, text, target_language):
         # Implement translation logic
@@ -18,5 +92,5 @@ class LanguageTranslator:
         prompt = f"Translate this text from English to {target_language}:\n{text}"
         return self.llm_client.ask_question(
             [{"role": "system", "content": f"You are a helpful assistant translating to\
-               {target_language} the provided text. Provide only the translated text as response."}, 
-              {"role": "user", "content": prompt}])
\ No newline at end of file
+               {target_language} the provided text. Provide only the translated text as response."},
+              {"role": "user", "content": prompt}])
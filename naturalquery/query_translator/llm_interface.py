@@ -10,11 +10,16 @@ def parse_yaml_config(file_path):
 
 # Step 2: Provider Interface
 class ProviderInterface:
+    # Providers able to constrain the response to a JSON object accept send_prompt(prompt, json_output=True)
+    supports_json_output = False
+
     def send_prompt(self, prompt):
         raise NotImplementedError
 
 # Step 3: Provider-Specific Classes
 class OpenAIProvider(ProviderInterface):
+    supports_json_output = True
+
     def __init__(self, config):
         self.model = config['llm']['model']
         self.model_kwargs = config['llm'].get('model_kwargs', {})
@@ -22,12 +27,14 @@ class OpenAIProvider(ProviderInterface):
             api_key = config['llm']['api_key']
         )
 
-    def send_prompt(self, prompt):
+    def send_prompt(self, prompt, json_output=False):
         try:
             mandatory_params = {
                 'model': self.model,
                 'messages': prompt,
             }
+            if json_output:
+                mandatory_params['response_format'] = {'type': 'json_object'}
             final_params = {**mandatory_params, **self.model_kwargs}
 
             response = self.client.chat.completions.create(
@@ -64,6 +71,9 @@ class CohereProvider(ProviderInterface):
             return None
 
 class AnyscaleProvider(OpenAIProvider):
+    # JSON mode is only available for some of the hosted models
+    supports_json_output = False
+
     def __init__(self, config):
         super().__init__(config)
         self.client = self.client = openai.OpenAI(
@@ -127,6 +137,151 @@ class CustomProvider(ProviderInterface):
             print(f"An error occurred: {e}")
             return None
 
+class TransformersProvider(ProviderInterface):
+    """
+        Runs a local text-to-SQL model in process through transformers, no network access needed.
+
+        Expected configuration:
+        llm:
+          provider: transformers
+          model: <model id or local path>   // seq2seq (e.g. T5) or causal LM
+          num_threads: 4                    // Optional: torch CPU threads
+          max_batch_size: 8                 // Optional: max prompts generated together
+          max_wait_ms: 20                   // Optional: how long to wait for a batch to fill
+          min_prefix_tokens: 64             // Optional: shortest shared prefix worth caching
+          model_kwargs:                     // Optional: passed to model.generate
+            max_new_tokens: 512
+
+        Concurrent send_prompt calls are queued and a single worker thread groups them into
+        padded batches. For causal models the KV cache of the prompt prefix shared by
+        consecutive requests (the DDL) is kept and reused when a prompt runs alone.
+    """
+    def __init__(self, config):
+        import queue
+        import threading
+        import torch
+        from transformers import AutoConfig, AutoTokenizer, AutoModelForCausalLM, AutoModelForSeq2SeqLM
+        llm_config = config['llm']
+        self.model_name = llm_config['model']
+        self.model_kwargs = {'max_new_tokens': 512, **llm_config.get('model_kwargs', {})}
+        self.max_batch_size = llm_config.get('max_batch_size', 8)
+        self.max_wait = llm_config.get('max_wait_ms', 20) / 1000
+        self.min_prefix_tokens = llm_config.get('min_prefix_tokens', 64)
+        if llm_config.get('num_threads'):
+            torch.set_num_threads(llm_config['num_threads'])
+
+        model_config = AutoConfig.from_pretrained(self.model_name)
+        self.is_encoder_decoder = model_config.is_encoder_decoder
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        if self.is_encoder_decoder:
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+        else:
+            # Left padding keeps the generated tokens aligned at the end of every row
+            self.tokenizer.padding_side = 'left'
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model.eval()
+
+        # Prefix cache: token ids of the last prompt, and the cached (ids, past_key_values) prefix
+        self._last_ids = None
+        self._prefix_ids = None
+        self._prefix_past = None
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="naturalquery-transformers", daemon=True)
+        self._worker.start()
+
+    def _format_prompt(self, prompt) -> str:
+        if isinstance(prompt, str):
+            return prompt
+        if getattr(self.tokenizer, 'chat_template', None) and not self.is_encoder_decoder:
+            return self.tokenizer.apply_chat_template(prompt, tokenize=False, add_generation_prompt=True)
+        return "\n\n".join(f"{message['role']}: {message['content']}" for message in prompt) + "\n\nassistant:"
+
+    def send_prompt(self, prompt) -> str:
+        from concurrent.futures import Future
+        future = Future()
+        self._queue.put((self._format_prompt(prompt), future))
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return None
+
+    def _run(self):
+        import queue
+        import time
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            texts = [text for text, _ in batch]
+            try:
+                outputs = self._generate(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def _generate(self, texts):
+        import torch
+        with torch.inference_mode():
+            if len(texts) == 1 and not self.is_encoder_decoder:
+                return [self._generate_with_prefix_cache(texts[0])]
+            inputs = self.tokenizer(texts, return_tensors='pt', padding=True, return_token_type_ids=False)
+            output_ids = self.model.generate(**inputs, pad_token_id=self.tokenizer.pad_token_id, **self.model_kwargs)
+        if not self.is_encoder_decoder:
+            # Causal models return the prompt followed by the generated tokens
+            output_ids = output_ids[:, inputs['input_ids'].shape[1]:]
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+    def _generate_with_prefix_cache(self, text):
+        import torch
+        input_ids = self.tokenizer(text)['input_ids']
+        past = self._get_prefix_past(input_ids)
+        input_tensor = torch.tensor([input_ids])
+        output_ids = self.model.generate(
+            input_ids=input_tensor,
+            attention_mask=torch.ones_like(input_tensor),
+            past_key_values=past,
+            pad_token_id=self.tokenizer.pad_token_id,
+            **self.model_kwargs)
+        return self.tokenizer.decode(output_ids[0, len(input_ids):], skip_special_tokens=True)
+
+    def _get_prefix_past(self, input_ids):
+        import torch
+        prefix_ids = self._prefix_ids
+        if prefix_ids is not None and len(prefix_ids) < len(input_ids) and input_ids[:len(prefix_ids)] == prefix_ids:
+            return self._prefix_past
+        # Cache the prefix this prompt shares with the previous one, if long enough
+        past = None
+        if self._last_ids is not None:
+            common = 0
+            for previous_id, current_id in zip(self._last_ids, input_ids):
+                if previous_id != current_id:
+                    break
+                common += 1
+            # At least one token must be left for generate to process
+            common = min(common, len(input_ids) - 1)
+            if common >= self.min_prefix_tokens:
+                past = self.model(torch.tensor([input_ids[:common]]), use_cache=True).past_key_values
+                if hasattr(past, 'to_legacy_cache'):
+                    past = past.to_legacy_cache()
+                self._prefix_ids = input_ids[:common]
+                self._prefix_past = past
+        self._last_ids = input_ids
+        return past
+
 class LangChainProvider(ProviderInterface):
     # Implement LangChain specific methods
     pass
@@ -144,6 +299,8 @@ def get_provider(config):
         return LangChainProvider(config)
     elif provider_name == 'custom':
         return CustomProvider(config)
+    elif provider_name == 'transformers':
+        return TransformersProvider(config)
     else:
         raise ValueError("Unsupported provider")
 
@@ -152,6 +309,16 @@ class LLMClient:
     def __init__(self, config_path):
         self.config = parse_yaml_config(config_path)
         self.provider = get_provider(self.config)
+        # Optional RequestScheduler limiting concurrent LLM calls
+        self.scheduler = None
 
-    def ask_question(self, prompt):
-        return self.provider.send_prompt(prompt)
+    def ask_question(self, prompt, json_output=False):
+        """
+        Args:
+            prompt (list): The chat messages.
+            json_output (bool): Ask the provider for a JSON object response, when it supports it.
+        """
+        kwargs = {'json_output': True} if json_output and self.provider.supports_json_output else {}
+        if self.scheduler is not None:
+            return self.scheduler.run('llm', self.provider.send_prompt, prompt, **kwargs)
+        return self.provider.send_prompt(prompt, **kwargs)
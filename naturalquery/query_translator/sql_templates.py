@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import threading
+from collections import Counter
+from ..utils import literal_spans, quote_string, replace_spans
+
+# Literals compared against a column are the ones worth turning into parameters,
+# others (LIMIT 10, GROUP BY 1, LIKE patterns...) stay inline
+PARAMETERIZABLE_PARENTS = ('EQ', 'NEQ', 'GT', 'GTE', 'LT', 'LTE', 'In', 'Between')
+SLOT_MARKER = "__nq_slot_{}__"
+SLOT_MARKER_PATTERN = re.compile(r"__nq_slot_(\d+)__")
+NUMBER_PATTERN = r"-?\d+(?:\.\d+)?"
+WORD_PATTERN = r"[^\s]+"
+
+class SQLTemplateStore:
+    """
+    Reuses validated SQL for questions that only differ in their literals.
+
+    When a generated query ran successfully, the literals that also appear in the question
+    (a name, a date, a number) are replaced by slots, both in the SQL and in the question.
+    The resulting (question pattern, SQL template) pair is stored per schema key. A new
+    question matching a pattern is answered by filling the slots with the values extracted
+    from it, without calling the LLM.
+    """
+    def __init__(self, cache_dir='cache_data', max_templates=500, min_fixed_chars=10):
+        self.cache_file = os.path.join(cache_dir, "sql_templates_cache.json")
+        self.max_templates = max_templates
+        self.min_fixed_chars = min_fixed_chars
+        self._lock = threading.Lock()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._templates = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        with open(self.cache_file, 'w') as file:
+            json.dump(self._templates, file)
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.split())
+
+    def learn(self, question: str, sql: str, schema_key: str, dialect: str = None) -> bool:
+        """
+        Extracts a template from a question and the SQL that answered it.
+
+        Returns:
+            bool: True if a template was stored.
+        """
+        import sqlglot
+        from sqlglot import exp
+        question = self._normalize(question)
+        try:
+            expression = sqlglot.parse_one(sql, read=dialect)
+        except Exception:
+            return False
+        if expression is None:
+            return False
+
+        # Only values whose every occurrence in the SQL is compared to a column can become slots
+        parameterizable = Counter((literal.this, literal.is_string) for literal in expression.find_all(exp.Literal)
+                                  if type(literal.parent).__name__ in PARAMETERIZABLE_PARENTS)
+        sql_spans = literal_spans(sql, dialect)
+        written = Counter((value, is_string) for _, _, value, is_string in sql_spans)
+
+        # Map each of those values found exactly once in the question to a slot
+        slots = {}
+        spans = []
+        for (value, is_string), count in parameterizable.items():
+            if written[(value, is_string)] != count or not value.strip():
+                continue
+            occurrences = [m for m in re.finditer(rf"(?<!\w){re.escape(value)}(?!\w)", question, re.IGNORECASE)]
+            if len(occurrences) != 1:
+                continue
+            span = occurrences[0].span()
+            if any(start < span[1] and span[0] < end for start, end, _ in spans):
+                continue
+            slot = len(slots)
+            slots[(value, is_string)] = slot
+            spans.append((span[0], span[1], slot))
+        if not slots:
+            # Nothing to parameterize, the pattern would only match this exact question
+            return False
+
+        template = replace_spans(sql, [(start, end, SLOT_MARKER.format(slots[(value, is_string)]))
+                                       for start, end, value, is_string in sql_spans if (value, is_string) in slots])
+
+        # Build the question pattern, slots become capture groups. A string slot matches as many
+        # words as the value it was learned from, so it can't swallow the rest of the question
+        kinds = {slot: 'string' if is_string else 'number' for (_, is_string), slot in slots.items()}
+        words = {slot: len(value.split()) for (value, _), slot in slots.items()}
+        pattern, position, fixed_chars = "", 0, 0
+        for start, end, slot in sorted(spans):
+            fixed = question[position:start]
+            fixed_chars += len(fixed.strip())
+            if kinds[slot] == 'string':
+                value_pattern = WORD_PATTERN + rf"(?: {WORD_PATTERN}){{{words[slot] - 1}}}"
+            else:
+                value_pattern = NUMBER_PATTERN
+            pattern += re.escape(fixed) + f"(?P<s{slot}>{value_pattern})"
+            position = end
+        fixed_chars += len(question[position:].strip())
+        pattern += re.escape(question[position:])
+        if fixed_chars < self.min_fixed_chars:
+            # Mostly made of literals, too likely to match unrelated questions
+            return False
+
+        with self._lock:
+            templates = self._templates.setdefault(schema_key, [])
+            templates[:] = [t for t in templates if t['pattern'] != pattern]
+            templates.append({'pattern': pattern, 'template': template, 'kinds': kinds})
+            del templates[:-self.max_templates]
+            self._save()
+        return True
+
+    def match(self, question: str, schema_key: str):
+        """
+        Returns:
+            tuple or None: (SQL template, {slot: value}) of the first stored pattern matching the question.
+        """
+        question = self._normalize(question)
+        with self._lock:
+            templates = list(self._templates.get(schema_key, []))
+        for entry in reversed(templates):
+            match = re.fullmatch(entry['pattern'], question, re.IGNORECASE)
+            if match is None:
+                continue
+            values = {}
+            for slot, kind in entry['kinds'].items():
+                value = match.group(f"s{slot}")
+                if kind == 'number':
+                    value = float(value) if '.' in value else int(value)
+                values[int(slot)] = value
+            return entry['template'], values
+        return None
+
+    def forget(self, template: str, schema_key: str):
+        with self._lock:
+            templates = self._templates.get(schema_key, [])
+            templates[:] = [t for t in templates if t['template'] != template]
+            self._save()
+
+    @staticmethod
+    def render(template: str, values: dict, placeholder: str = None):
+        """
+        Fills the slots of a template.
+
+        Args:
+            template (str): SQL with slot markers.
+            values (dict): Slot number to value.
+            placeholder (str): The connector bind parameter placeholder (e.g. '?' or '%s').
+                When None the values are inlined as SQL literals.
+
+        Returns:
+            tuple: (sql, params) where params is the list of bound values in order of appearance,
+            or None when the values are inlined.
+        """
+        if placeholder is None:
+            def to_literal(match):
+                value = values[int(match.group(1))]
+                return quote_string(value) if isinstance(value, str) else str(value)
+            return SLOT_MARKER_PATTERN.sub(to_literal, template), None
+        params = [values[int(slot)] for slot in SLOT_MARKER_PATTERN.findall(template)]
+        if placeholder == '%s':
+            # pyformat drivers treat every % as a format character once params are given
+            template = template.replace('%', '%%')
+        return SLOT_MARKER_PATTERN.sub(lambda _: placeholder, template), params
@@ -1,8 +1,14 @@
 import hashlib
+import json
+import time
 from ..connectors import ConnectorFactory
 from ..cache.ddl_cache import DDLCache
+from ..cache.schema_refresher import SchemaRefresher
+from ..cache.value_index import ColumnValueIndex
+from ..scheduler import RequestScheduler, request_context
 from .llm_interface import LLMClient
 from .language_translator import LanguageTranslator
+from .sql_templates import SQLTemplateStore
 
 SUPPORTED_LANGUAGES = {
     'En': 'English',
@@ -12,12 +18,15 @@ SUPPORTED_LANGUAGES = {
 
 class QueryTranslator:
     def __init__(self, config_path: str, 
-                 language: str = "En"):
+                 language: str = "En",
+                 fused: bool = False):
         import yaml
         # Validate the language
         if language not in SUPPORTED_LANGUAGES.keys():
             raise ValueError(f"Unsupported language. Supported languages are: {SUPPORTED_LANGUAGES}")
         self.language = SUPPORTED_LANGUAGES[language]
+        # In fused mode translation and SQL generation are done in a single LLM call
+        self.fused = fused
         # Initialize LLMClient with the configuration file path
         self.llm_interface = LLMClient(config_path)
         self.language_translator = LanguageTranslator(self.llm_interface)
@@ -29,9 +38,57 @@ class QueryTranslator:
         db_config = config['database']
         ## Convert database configuration for ConnectorFactory
         db_type = db_config.pop('provider')  # Removes and returns the 'provider'
+        db_key = self.__hash_text(f"{db_type}:{sorted(db_config.items())}")
         self.db_connector = ConnectorFactory.get_connector(db_type, db_config)
         ## Cache object for the database ddl
         self.cacher = DDLCache()
+        ## Optional scheduler shared by the llm and database stages
+        self.scheduler = None
+        scheduler_config = config.get('scheduler') or {}
+        if scheduler_config.get('enabled', False):
+            self.scheduler = RequestScheduler(
+                stages={'llm': scheduler_config.get('llm_concurrency', 4),
+                        'db': scheduler_config.get('db_concurrency', 8)},
+                priorities=scheduler_config.get('priorities'),
+                tenant_concurrency=scheduler_config.get('tenant_concurrency'),
+                tenant_limits=scheduler_config.get('tenant_limits'))
+            self.llm_interface.scheduler = self.scheduler
+            self.db_connector.scheduler = self.scheduler
+        ## Optional index of distinct values of low-cardinality text columns, to fix sql literals
+        self.value_index = None
+        value_index_config = config.get('value_index') or {}
+        if value_index_config.get('enabled', False):
+            self.value_index = ColumnValueIndex(
+                self.db_connector,
+                index_key=db_key[:16],
+                max_distinct=value_index_config.get('max_distinct', 200),
+                refresh_hours=value_index_config.get('refresh_hours', 24))
+        ## Optional background refresher keeping the enriched ddl up to date
+        self.schema_refresher = None
+        refresh_config = config.get('schema_refresh') or {}
+        if refresh_config.get('enabled', False):
+            self.schema_refresher = SchemaRefresher(
+                self.db_connector,
+                enrich_fn=lambda ddl: self.enrich_ddl_with_comments(ddl),
+                interval=refresh_config.get('interval', 300))
+            if self.value_index is not None:
+                # Keep the value index fresh off the request path too, a few columns per tick
+                refresh_columns = value_index_config.get('refresh_columns', 20)
+                self.schema_refresher.tasks.append(lambda: self.value_index.refresh(
+                    max_columns=refresh_columns, fingerprint=self.schema_refresher.fingerprint))
+            self.schema_refresher.start()
+        elif self.value_index is not None:
+            # No refresher to maintain it, sample the missing and stale columns once per startup
+            self.value_index.refresh_in_background()
+        ## Optional reuse of validated sql for questions differing only in literals
+        self.sql_templates = None
+        if (config.get('sql_templates') or {}).get('enabled', False):
+            self.sql_templates = SQLTemplateStore()
+
+    def close(self):
+        """ Stop background work started by the translator. """
+        if self.schema_refresher is not None:
+            self.schema_refresher.stop()
 
     def __hash_text(self, text: str):
         """ Hash a given text using SHA256 and return the hexadecimal hash. """
@@ -79,17 +136,27 @@ class QueryTranslator:
         self.cacher.cache_ddl(hash_key, enriched_ddl)
         return enriched_ddl
     
-    def correct_sql_query(self, error: str):
+    def get_database_ddl(self) -> str:
+        """ Return the enriched DDL, from the background refresher when it is enabled. """
+        if self.schema_refresher is not None:
+            database_ddl = self.schema_refresher.get_catalog()
+            if database_ddl is not None:
+                return database_ddl
+        return self.enrich_ddl_with_comments(self.db_connector.get_all_schemas_ddl())
+
+    def correct_sql_query(self, error: str, database_ddl: str = None):
         system_prompt="You are a helpful SQL developer.\n- Look at the error and the DDL to find a fix.\n- Make sure all join keys are consistant with the database schema or DDL."
-        prompt=f"Fix the SQL query based on the error \n {error}.\nSQL DDL is the following:\n {self.enrich_ddl_with_comments(self.db_connector.get_all_schemas_ddl())}"
+        # The DDL goes first so the prompt shares its prefix with the other calls (provider prompt caching)
+        database_ddl = database_ddl if database_ddl is not None else self.get_database_ddl()
+        prompt=f"SQL DDL is the following:\n {database_ddl}\nFix the SQL query based on the error \n {error}."
         response = self.llm_interface.ask_question(
             [{"role": "system", "content": system_prompt}, 
               {"role": "user", "content": prompt}]
         )
         return self.__extract_sql_code(response)
     
-    def translate_question_to_sql(self, question: str):
-        database_ddl = self.enrich_ddl_with_comments(self.db_connector.get_all_schemas_ddl())
+    def translate_question_to_sql(self, question: str, database_ddl: str = None):
+        database_ddl = database_ddl if database_ddl is not None else self.get_database_ddl()
         database_type = self.db_connector.db_type
         system_prompt="You are a helpful SQL develper.\n-Reply with SQL code snippet example : ```sql select * from table```.\n-If the question provided cannot be answered in the database return ```sql\n SELECT 'Answer is not in the database' AS Response;```"
         prompt = f"Depending on the following SQL DDL:\n{database_ddl}\nAnswer the question in SQL for {database_type}: {question}\n "
@@ -99,6 +166,64 @@ class QueryTranslator:
             )
         return self.__extract_sql_code(sql_query)
 
+    def ground_sql_literals(self, sql_query: str, verbose=False, fuzzy=False) -> str:
+        """
+        Replace string literals which don't exist in the database by the stored values they refer to.
+
+        Only case and whitespace variants are replaced unless `fuzzy`, the closest stored value may
+        be a different one so it is only tried once the query returned nothing.
+        """
+        if self.value_index is None or sql_query is None or not self.value_index.built:
+            # The index is built off the request path, skip grounding until it is ready
+            return sql_query
+        sql_query, replacements = self.value_index.ground_sql(sql_query, self.db_connector.sql_dialect, fuzzy)
+        if verbose:
+            for column, value, replacement in replacements:
+                print(f"Replaced {column} = '{value}' by '{replacement}'")
+        return sql_query
+
+    def translate_question_to_sql_fused(self, question: str, database_ddl: str = None):
+        """
+        Translate the question to English and to SQL in one LLM call.
+
+        The system message holds only stable content (instructions then DDL) so providers
+        with prompt caching can reuse it across questions, the question comes last.
+
+        Returns:
+            tuple: (question in English, sql query or None)
+        """
+        database_ddl = database_ddl if database_ddl is not None else self.get_database_ddl()
+        database_type = self.db_connector.db_type
+        system_prompt=("You are a helpful SQL develper.\n"
+                       f"-The question may be written in {self.language}, first translate it to English.\n"
+                       f"-Then answer the question in SQL for {database_type}.\n"
+                       "-If the question provided cannot be answered in the database use the SQL: SELECT 'Answer is not in the database' AS Response;\n"
+                       "-Reply only with a JSON object: {\"question\": \"<question in English>\", \"sql\": \"<SQL query>\"}\n"
+                       f"SQL DDL:\n{database_ddl}")
+        response = self.llm_interface.ask_question(
+            [{"role": "system", "content": system_prompt},
+              {"role": "user", "content": question}],
+            json_output=True
+            )
+        if response is None:
+            return question, None
+        parsed = self.__parse_json_object(response)
+        if parsed is None or not parsed.get('sql'):
+            # The model ignored the format, fall back to a plain sql code block
+            return question, self.__extract_sql_code(response)
+        return parsed.get('question') or question, parsed['sql']
+
+    def __parse_json_object(self, text: str):
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end <= start:
+            return None
+        try:
+            # Models often write the SQL over several lines, raw newlines in strings are fine
+            parsed = json.loads(text[start:end + 1], strict=False)
+        except ValueError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
     def interpret_query_results(self, query: str, query_results, question: str):
         # Assuming query_results is a string or a format that LLM can interpret
         interpretation_prompt = f"Answer the following question based on this query {query} and the results of the execution of the query: {query_results}\n{question}.\nDon't give explanations, just answer the question."
@@ -110,29 +235,139 @@ class QueryTranslator:
               {"role": "user", "content": interpretation_prompt}])
         return interpretation
     
-    def answer(self, question: str, verbose=False) -> str:
-        # Translate the question to English if necessary
+    def _execute_sql_template(self, question: str, schema_key: str, timings: dict, verbose=False):
+        """
+        Answer the question from a stored SQL template, without calling the LLM.
+
+        Returns:
+            tuple or None: (sql query with inlined values, query results), None if no template applies.
+        """
+        from pandas.errors import DatabaseError
+        start = time.perf_counter()
+        template_match = self.sql_templates.match(question, schema_key)
+        timings['template_lookup'] = time.perf_counter() - start
+        if template_match is None:
+            return None
+        template, values = template_match
+        if self.value_index is not None and self.value_index.built:
+            # The slot values must be values the columns actually hold, up to case and whitespace
+            inline_sql, _ = self.sql_templates.render(template, values)
+            for column, value, stored_value in self.value_index.check_values(inline_sql, self.db_connector.sql_dialect):
+                if stored_value is None:
+                    if verbose:
+                        print(f"Not using the sql template, '{value}' isn't a value of {column}...")
+                    return None
+                values = {slot: stored_value if slot_value == value else slot_value for slot, slot_value in values.items()}
+        sql_query, params = self.sql_templates.render(template, values, self.db_connector.param_placeholder)
+        if verbose:
+            print(f"Using sql template with parameters {params}...")
+        start = time.perf_counter()
+        try:
+            exec_results = self.db_connector.query_to_dataframe(sql_query, params=params)
+        except DatabaseError:
+            # The template doesn't fit this question after all, let the LLM handle it
+            self.sql_templates.forget(template, schema_key)
+            return None
+        timings['execution'] = time.perf_counter() - start
+        if exec_results.empty:
+            # Maybe a wrong slot value, let the LLM have a look rather than answering from nothing
+            if verbose:
+                print("The sql template returned no rows...")
+            return None
+        sql_query, _ = self.sql_templates.render(template, values)
+        return sql_query, exec_results
+
+    def _generate_and_execute(self, question: str, database_ddl: str, timings: dict, verbose=False):
+        """
+        Generate the SQL with the LLM and execute it, asking the LLM for a fix once if it fails.
+
+        Returns:
+            tuple: (question in English, sql query, query results)
+        """
         original_language = self.language
-        if original_language != 'English':
-            question = self.language_translator.translate_to_english(question, original_language)
+        if self.fused and original_language != 'English':
+            # Translate the question to English and to sql statement in one go
+            start = time.perf_counter()
+            question, sql_query = self.translate_question_to_sql_fused(question, database_ddl)
+            timings['translate_and_sql'] = time.perf_counter() - start
+        else:
+            # Translate the question to English if necessary
+            if original_language != 'English':
+                start = time.perf_counter()
+                question = self.language_translator.translate_to_english(question, original_language)
+                timings['translate'] = time.perf_counter() - start
 
-        # Translate the question to sql statement
-        sql_query = self.translate_question_to_sql(question)
+            # Translate the question to sql statement
+            start = time.perf_counter()
+            sql_query = self.translate_question_to_sql(question, database_ddl)
+            timings['sql'] = time.perf_counter() - start
+        sql_query = self.ground_sql_literals(sql_query, verbose)
         from pandas.errors import DatabaseError
         # Execute the query and get the final results
+        start = time.perf_counter()
+        correction_time = 0.0
         try:
             exec_results = self.db_connector.query_to_dataframe(sql_query)
         except DatabaseError as exc:
             if verbose:
                 print("Trying to fix the query...")
-            sql_query = self.correct_sql_query(exc)
+            correction_start = time.perf_counter()
+            sql_query = self.ground_sql_literals(self.correct_sql_query(exc, database_ddl), verbose)
+            correction_time = time.perf_counter() - correction_start
+            timings['correction'] = correction_time
             try:
                 exec_results = self.db_connector.query_to_dataframe(sql_query)
-            except:
+            except DatabaseError:
                 raise ValueError("Coulnd't find a valid sql to it.")
+        if exec_results.empty:
+            # Maybe a misspelled value, retry with the closest values the columns hold
+            fuzzy_query = self.ground_sql_literals(sql_query, verbose, fuzzy=True)
+            if fuzzy_query != sql_query:
+                fuzzy_results = self.db_connector.query_to_dataframe(fuzzy_query)
+                if not fuzzy_results.empty:
+                    sql_query, exec_results = fuzzy_query, fuzzy_results
+        timings['execution'] = time.perf_counter() - start - correction_time
+        return question, sql_query, exec_results
+
+    def answer(self, question: str, verbose=False, priority='interactive', tenant='default', timeout=None,
+               timings: dict = None) -> str:
+        """
+        Answer a natural language question from the database.
+
+        Args:
+            question (str): The question, in the language of the translator.
+            verbose (bool): Print progress and per stage timings.
+            priority (str): Priority class of the request when the scheduler is enabled, e.g. 'interactive' or 'batch'.
+            tenant (str): Tenant the request is accounted to by the scheduler.
+            timeout (float): Seconds after which the scheduler drops the request with DeadlineExceeded.
+            timings (dict): If given, filled with the seconds spent in each stage of this call.
+        """
+        if timings is None:
+            timings = {}
+        with request_context(priority=priority, tenant=tenant, timeout=timeout):
+            return self._answer(question, timings, verbose)
+
+    def _answer(self, question: str, timings: dict, verbose=False) -> str:
+        original_question = question
+        templated = None
+        # Computed once, introspection is done on every call when the schema refresher is off
+        database_ddl = self.get_database_ddl()
+        if self.sql_templates is not None:
+            schema_key = self.__hash_text(database_ddl)
+            templated = self._execute_sql_template(question, schema_key, timings, verbose)
+        if templated is not None:
+            sql_query, exec_results = templated
+        else:
+            question, sql_query, exec_results = self._generate_and_execute(question, database_ddl, timings, verbose)
+            if self.sql_templates is not None:
+                self.sql_templates.learn(original_question, sql_query, schema_key, self.db_connector.sql_dialect)
         # With the help of the LLM get a response in natural language
+        start = time.perf_counter()
         response=self.interpret_query_results(
             query=sql_query, query_results=exec_results, question=question)
+        timings['interpretation'] = time.perf_counter() - start
+        if verbose:
+            print("Timings: " + ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items()))
         
         # Translate the response back to the original language if necessary
         #if original_language != 'En':
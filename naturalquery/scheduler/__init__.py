@@ -0,0 +1 @@
+from .request_scheduler import RequestScheduler, DeadlineExceeded, request_context, get_request_context
@@ -0,0 +1,193 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_PRIORITIES = {'interactive': 10, 'batch': 1}
+
+class DeadlineExceeded(TimeoutError):
+    """ Raised when a request is dropped because it can no longer finish before its deadline. """
+
+class RequestContext:
+    def __init__(self, priority='interactive', tenant='default', deadline=None):
+        self.priority = priority
+        self.tenant = tenant
+        # Absolute time.monotonic() deadline, None for no deadline
+        self.deadline = deadline
+
+_current_context = contextvars.ContextVar('naturalquery_request_context', default=RequestContext())
+
+def get_request_context() -> RequestContext:
+    return _current_context.get()
+
+@contextmanager
+def request_context(priority='interactive', tenant='default', timeout=None):
+    """
+    Tags the LLM and database calls made inside the block with a priority class, a tenant
+    and an optional deadline `timeout` seconds from now.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    token = _current_context.set(RequestContext(priority, tenant, deadline))
+    try:
+        yield
+    finally:
+        _current_context.reset(token)
+
+class _Waiter:
+    def __init__(self, context):
+        self.priority = context.priority
+        self.tenant = context.tenant
+        self.deadline = context.deadline
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+        self.dropped = False
+
+class _Stage:
+    def __init__(self, name, concurrency, priorities, recent_waits=1000):
+        self.name = name
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.tenant_in_flight = {}
+        self.queues = {priority: deque() for priority in priorities}
+        # Stride scheduling: the class with the smallest pass runs next, each dispatch adds 1/weight
+        self.passes = {priority: 0.0 for priority in priorities}
+        # Exponential moving average of the time a call holds a slot
+        self.service_time = 0.0
+        self.completed = 0
+        self.dropped = 0
+        self.waits = deque(maxlen=recent_waits)
+
+class RequestScheduler:
+    """
+    Admission control for the LLM and database stages of a request.
+
+    Each stage has a concurrency limit. Waiting calls are queued per priority class and
+    classes are served in proportion to their weight, so a burst of batch questions
+    can't starve interactive ones. A tenant can't hold more than its cap of slots in a
+    stage, and calls that can't finish before their deadline, given the observed service
+    time of the stage, are dropped with DeadlineExceeded instead of queueing.
+    """
+    def __init__(self, stages=None, priorities=None, tenant_concurrency=None, tenant_limits=None):
+        """
+        Args:
+            stages (dict): Stage name to max concurrent calls, defaults to {'llm': 4, 'db': 8}.
+            priorities (dict): Priority class to weight, defaults to {'interactive': 10, 'batch': 1}.
+            tenant_concurrency (int): Default max concurrent calls per tenant and stage, None for no cap.
+            tenant_limits (dict): Tenant to max concurrent calls per stage, overrides tenant_concurrency.
+        """
+        stages = stages or {'llm': 4, 'db': 8}
+        self.priorities = dict(priorities or DEFAULT_PRIORITIES)
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_limits = dict(tenant_limits or {})
+        self._condition = threading.Condition()
+        self._stages = {name: _Stage(name, concurrency, self.priorities) for name, concurrency in stages.items()}
+
+    def _tenant_cap(self, tenant):
+        return self.tenant_limits.get(tenant, self.tenant_concurrency)
+
+    def _is_hopeless(self, stage, waiter, now):
+        return waiter.deadline is not None and now + stage.service_time > waiter.deadline
+
+    def _dispatch(self, stage):
+        """ Grants free slots to waiting calls, must be called with the condition held. """
+        now = time.monotonic()
+        # Drop the calls which can't make it anymore
+        for queue in stage.queues.values():
+            for waiter in [w for w in queue if self._is_hopeless(stage, w, now)]:
+                queue.remove(waiter)
+                waiter.dropped = True
+                stage.dropped += 1
+                waiter.event.set()
+        while stage.in_flight < stage.concurrency:
+            candidates = []
+            for priority, queue in stage.queues.items():
+                for waiter in queue:
+                    cap = self._tenant_cap(waiter.tenant)
+                    if cap is None or stage.tenant_in_flight.get(waiter.tenant, 0) < cap:
+                        candidates.append((stage.passes[priority], priority, waiter))
+                        break
+            if not candidates:
+                return
+            _, priority, waiter = min(candidates, key=lambda candidate: candidate[0])
+            stage.queues[priority].remove(waiter)
+            stage.passes[priority] += 1.0 / self.priorities[priority]
+            stage.in_flight += 1
+            stage.tenant_in_flight[waiter.tenant] = stage.tenant_in_flight.get(waiter.tenant, 0) + 1
+            stage.waits.append(now - waiter.enqueued_at)
+            waiter.granted = True
+            waiter.event.set()
+
+    def _acquire(self, stage, context):
+        waiter = _Waiter(context)
+        with self._condition:
+            if waiter.priority not in stage.queues:
+                # Unknown classes get the lowest weight
+                waiter.priority = min(self.priorities, key=self.priorities.get)
+            if self._is_hopeless(stage, waiter, waiter.enqueued_at):
+                stage.dropped += 1
+                raise DeadlineExceeded(f"Request dropped from stage '{stage.name}', it can't finish before its deadline.")
+            if not stage.queues[waiter.priority]:
+                # An idle class doesn't accumulate credit while it has nothing to run
+                active = [stage.passes[p] for p, q in stage.queues.items() if q]
+                if active:
+                    stage.passes[waiter.priority] = max(stage.passes[waiter.priority], min(active))
+            stage.queues[waiter.priority].append(waiter)
+            self._dispatch(stage)
+
+        timeout = None if waiter.deadline is None else max(waiter.deadline - time.monotonic(), 0)
+        waiter.event.wait(timeout)
+        with self._condition:
+            if waiter.granted:
+                return
+            if not waiter.dropped:
+                # Deadline reached while still queued
+                stage.queues[waiter.priority].remove(waiter)
+                stage.dropped += 1
+        raise DeadlineExceeded(f"Request dropped from stage '{stage.name}', it can't finish before its deadline.")
+
+    def _release(self, stage, tenant, service_time):
+        with self._condition:
+            stage.in_flight -= 1
+            stage.tenant_in_flight[tenant] -= 1
+            if stage.tenant_in_flight[tenant] == 0:
+                del stage.tenant_in_flight[tenant]
+            stage.completed += 1
+            stage.service_time = service_time if stage.completed == 1 else 0.8 * stage.service_time + 0.2 * service_time
+            self._dispatch(stage)
+
+    def run(self, stage_name, fn, *args, **kwargs):
+        """ Runs fn(*args, **kwargs) once the current request gets a slot in the given stage. """
+        stage = self._stages.get(stage_name)
+        if stage is None:
+            return fn(*args, **kwargs)
+        context = get_request_context()
+        self._acquire(stage, context)
+        start = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._release(stage, context.tenant, time.monotonic() - start)
+
+    def get_metrics(self) -> dict:
+        """
+        Returns per stage: in flight calls, queue depth per priority class, completed and dropped
+        counts, the service time estimate and queue wait statistics over the recent calls.
+        """
+        metrics = {}
+        with self._condition:
+            for name, stage in self._stages.items():
+                waits = sorted(stage.waits)
+                metrics[name] = {
+                    'in_flight': stage.in_flight,
+                    'queue_depth': {priority: len(queue) for priority, queue in stage.queues.items()},
+                    'completed': stage.completed,
+                    'dropped': stage.dropped,
+                    'service_time': stage.service_time,
+                    'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+                    'wait_p50': waits[len(waits) // 2] if waits else 0.0,
+                    'wait_p99': waits[min(int(len(waits) * 0.99), len(waits) - 1)] if waits else 0.0,
+                    'wait_max': waits[-1] if waits else 0.0,
+                }
+        return metrics
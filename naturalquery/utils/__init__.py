@@ -0,0 +1 @@
+from .sql_literals import literal_spans, quote_string, replace_spans
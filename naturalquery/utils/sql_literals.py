@@ -0,0 +1,47 @@
+"""
+Helpers to edit the literals of a SQL query in place.
+"""
+
+def literal_spans(sql: str, dialect: str = None):
+    """
+    Returns:
+        list: (start, end, value, is_string) for every string and number literal of the query,
+        where sql[start:end] is the literal as written (quotes included, N prefix excluded).
+    """
+    from sqlglot.dialects.dialect import Dialect
+    from sqlglot.tokens import TokenType
+    spans = []
+    for token in Dialect.get_or_raise(dialect)().tokenize(sql):
+        # token.end is the exclusive end offset in the original text
+        end = token.end
+        if token.token_type == TokenType.NUMBER:
+            spans.append((end - len(token.text), end, token.text, False))
+        elif token.token_type in (TokenType.STRING, TokenType.NATIONAL):
+            quote = sql[end - 1]
+            start = end - 2
+            # Walk back to the opening quote, skipping doubled (escaped) quotes
+            while start >= 0:
+                if sql[start] == quote:
+                    if start > 0 and sql[start - 1] == quote:
+                        start -= 2
+                        continue
+                    break
+                start -= 1
+            # Skip what can't be mapped back reliably (e.g. postgres dollar quoting)
+            if start >= 0 and sql[start + 1:end - 1].replace(quote * 2, quote) == token.text:
+                spans.append((start, end, token.text, True))
+    return spans
+
+def quote_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def replace_spans(sql: str, replacements) -> str:
+    """
+    Applies (start, end, text) replacements to sql, the spans must not overlap.
+
+    Editing the original text rather than re-rendering a parsed query with sqlglot keeps valid
+    SQL as written (e.g. TOP n would become FETCH FIRST on tsql).
+    """
+    for start, end, text in sorted(replacements, reverse=True):
+        sql = sql[:start] + text + sql[end:]
+    return sql
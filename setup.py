@@ -13,6 +13,7 @@ setup(
     #package_dir={'': '.'},
     install_requires=[
         'pandas>=2.0.0',
+        'pyarrow>=14.0.0',
         'sqlalchemy<2.0.0',
         'transformers==4.36.2',
         'datasets==2.11.0',